@@ -25,6 +25,7 @@ setup(
 
     install_requires=['requests'],
     packages=find_packages(),
+    entry_points={'console_scripts': [f'{name} = {name}.__main__:main']},
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
@@ -0,0 +1,198 @@
+import socket
+from contextlib import contextmanager
+from os import stat
+from stat import S_IMODE
+from threading import Thread
+from time import sleep
+from typing import List, Iterator, Optional
+
+from assertpy import assert_that
+from pytest import fixture, raises
+
+from verarandom import (
+    VeraRandom, RandomConfig, RandomNumberLimitTooSmall, TooManyRandomNumbersRequested,
+    ServiceUnavailable, VeraRandomError, DaemonError, Fallback, RandomSource,
+    RandomNumberLimitTooLarge, DeadlineExceeded,
+)
+from verarandom.daemon import (
+    DaemonRandom, EntropyPool, EntropyServer, MAX_NUMBER_OF_ITEMS, MAX_INTEGER_LIMIT,
+)
+
+
+class _CountingRandom(VeraRandom):
+    def __init__(self):
+        # noinspection PyArgumentList
+        super().__init__(RandomConfig(2 ** 16, 0, 1000, 1000))
+        self.requests = 0
+        self.error: Optional[Exception] = None
+        self._next = 0
+
+    def _request_randoms(self, n: int) -> List[float]:
+        raise NotImplementedError
+
+    def _request_randints(self, a: int, b: int, n: int) -> List[int]:
+        self.requests += 1
+        if self.error is not None:
+            raise self.error
+        randints = [(self._next + i * 7919) % (b + 1) for i in range(n)]
+        self._next += 1
+        return randints
+
+
+@fixture
+def source() -> _CountingRandom:
+    return _CountingRandom()
+
+
+@fixture
+def socket_path(tmp_path) -> str:
+    return str(tmp_path / 'verarandom.sock')
+
+
+@fixture
+def client(socket_path: str, source: _CountingRandom) -> Iterator[DaemonRandom]:
+    with _serve(socket_path, source):
+        vera = DaemonRandom(socket_path, fallback=Fallback.SYSTEM_RANDOM)
+        yield vera
+        vera.close()
+
+
+@contextmanager
+def _serve(socket_path: str, source: VeraRandom):
+    server = EntropyServer(socket_path, EntropyPool(source))
+    Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_randints(client: DaemonRandom):
+    randints = client.randint(1, 6, n=500)
+    assert_that(randints).is_length(500)
+    assert_that(set(randints)).is_subset_of(set(range(1, 7)))
+
+
+def test_single_randint(client: DaemonRandom):
+    assert_that(client.randint(-3, -3)).is_equal_to(-3)
+
+
+def test_randoms(client: DaemonRandom):
+    randoms = client.random(100)
+    assert_that(randoms).is_length(100)
+    assert_that(min(randoms)).is_greater_than_or_equal_to(0)
+    assert_that(max(randoms)).is_less_than(1)
+
+
+def test_randbytes(client: DaemonRandom):
+    assert_that(client.randbytes(33)).is_length(33)
+
+
+def test_requests_are_served_from_buffer(client: DaemonRandom, source: _CountingRandom):
+    for _ in range(200):
+        client.randint(0, 255)
+    assert_that(source.requests).is_less_than_or_equal_to(2)
+    assert_that(client.last_source).is_equal_to(RandomSource.SERVICE)
+
+
+def test_daemon_errors_are_reraised(client: DaemonRandom):
+    with raises(RandomNumberLimitTooSmall):
+        client.randint(5, 1)
+    assert_that(client.randint(1, 1)).is_equal_to(1)
+
+
+def test_max_integer_too_large_with_zero_lower_limit(client: DaemonRandom):
+    with raises(RandomNumberLimitTooLarge):
+        client.randint(0, MAX_INTEGER_LIMIT + 1)
+
+
+def test_too_many_randoms(client: DaemonRandom):
+    with raises(TooManyRandomNumbersRequested):
+        client.random(MAX_NUMBER_OF_ITEMS + 1)
+
+
+def test_exact_range_reduction(source: _CountingRandom):
+    pool = EntropyPool(source)
+    assert_that(set(pool.randints(0, 2, 3000))).is_equal_to({0, 1, 2})
+
+
+def test_pool_refills_in_background(source: _CountingRandom):
+    pool = EntropyPool(source, fetch_size=10, low_water_mark=15)
+    pool.randbytes(10)
+    _wait_for_requests(source, 2)
+    assert_that(source.requests).is_equal_to(2)
+
+    source.error = RuntimeError('the buffer should be enough')
+    assert_that(pool.randbytes(30)).is_length(30)
+    _wait_for_requests(source, 3)
+    assert_that(source.requests).is_equal_to(3)
+
+
+def _wait_for_requests(source: _CountingRandom, requests: int):
+    for _ in range(100):
+        if source.requests >= requests:
+            return
+        sleep(0.01)
+
+
+def test_upstream_errors_are_reraised(client: DaemonRandom, source: _CountingRandom):
+    source.error = RuntimeError('boom')
+    client.fallback = Fallback.RAISE
+    with raises(VeraRandomError, match='RuntimeError: boom'):
+        client.randbytes(100_000)
+    source.error = None
+    assert_that(client.randbytes(1)).is_length(1)
+
+
+def test_unavailable_upstream_uses_fallback(client: DaemonRandom, source: _CountingRandom):
+    source.error = ServiceUnavailable()
+    assert_that(client.randbytes(100_000)).is_length(100_000)
+    assert_that(client.last_source).is_equal_to(RandomSource.SYSTEM_RANDOM)
+
+
+def test_expired_deadline_keeps_connection(client: DaemonRandom):
+    client.fallback = Fallback.RAISE
+    client.randint(1, 6)
+    connection = client._socket
+    with raises(DeadlineExceeded):
+        client.randint(1, 6, deadline=0)
+    assert_that(client._socket).is_same_as(connection)
+    assert_that(client.randint(1, 1)).is_equal_to(1)
+
+
+def test_missing_daemon(socket_path: str):
+    vera = DaemonRandom(socket_path)
+    for _ in range(2):
+        with raises(ServiceUnavailable):
+            vera.randint(1, 6)
+
+
+def test_missing_daemon_fallback(socket_path: str):
+    vera = DaemonRandom(socket_path, fallback=Fallback.SYSTEM_RANDOM)
+    assert_that(vera.randbytes(8)).is_length(8)
+    assert_that(vera.last_source).is_equal_to(RandomSource.SYSTEM_RANDOM)
+
+
+def test_socket_is_private(client: DaemonRandom):
+    assert_that(S_IMODE(stat(client.socket_path).st_mode)).is_equal_to(0o600)
+
+
+def test_regular_file_is_not_replaced(tmp_path, source: _CountingRandom):
+    notes = tmp_path / 'notes'
+    notes.write_text('important')
+    with raises(DaemonError):
+        EntropyServer(str(notes), EntropyPool(source))
+    assert_that(notes.read_text()).is_equal_to('important')
+
+
+def test_running_daemon_is_not_replaced(client: DaemonRandom, source: _CountingRandom):
+    with raises(DaemonError):
+        EntropyServer(client.socket_path, EntropyPool(source))
+
+
+def test_stale_socket_is_replaced(socket_path: str, source: _CountingRandom):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale_socket:
+        stale_socket.bind(socket_path)
+    with _serve(socket_path, source):
+        assert_that(DaemonRandom(socket_path).randint(1, 1)).is_equal_to(1)
@@ -0,0 +1,111 @@
+from typing import List
+from unittest import mock
+
+import responses
+from assertpy import assert_that
+from pytest import mark, raises
+
+from verarandom import (
+    RandomOrg, InvalidDiceExpression, NoRandomNumbersRequested, RandomNumberLimitTooLarge,
+    TooManyDiceExplosions,
+)
+from verarandom.daemon import DaemonRandom
+from verarandom.dice import (
+    compile_dice, DiceExpression, DiceTerm, MAX_DICE, MAX_EXPLOSION_ROUNDS,
+)
+from verarandom.random_org_v1 import (
+    INTEGER_URL, MAX_QUOTA, MAX_NUMBER_OF_INTEGERS, MAX_INTEGER_LIMIT,
+)
+
+
+@mark.parametrize('expression, compiled', [
+    ('d20', DiceExpression((DiceTerm(1, 20),))),
+    ('8d6+3', DiceExpression((DiceTerm(8, 6),), 3)),
+    ('4D6kh3', DiceExpression((DiceTerm(4, 6, keep=3),))),
+    ('4d6dl1', DiceExpression((DiceTerm(4, 6, keep=3),))),
+    ('2d20kl1', DiceExpression((DiceTerm(2, 20, keep=1, keep_highest=False),))),
+    ('3d8dh1', DiceExpression((DiceTerm(3, 8, keep=2, keep_highest=False),))),
+    (' 2d10! - 1d% - 1 + 4 ', DiceExpression(
+        (DiceTerm(2, 10, exploding=True), DiceTerm(1, 100, sign=-1)), 3)),
+])
+def test_compile(expression: str, compiled: DiceExpression):
+    assert_that(compile_dice(expression)).is_equal_to(compiled)
+
+
+@mark.parametrize('expression', ['', 'd', '2d6 3', '0d6', '2d0', '2d6kh3', 'd1!', '2d6+', 'x'])
+def test_invalid_expression(expression: str):
+    with raises(InvalidDiceExpression):
+        compile_dice(expression)
+
+
+@mark.parametrize('expression', [f'{MAX_DICE + 1}d6', f'{MAX_DICE}d6+1d4', '100000000d6'])
+def test_too_many_dice(expression: str):
+    with raises(InvalidDiceExpression):
+        compile_dice(expression)
+
+
+@mark.parametrize('expression, dice, output', [
+    ('2d6+3', {6: [1, 6, 2, 2]}, [10, 7]),
+    ('4d6kh3', {6: [1, 2, 3, 4]}, [9]),
+    ('2d6kl1-1d4', {6: [5, 3, 2, 6], 4: [4, 1]}, [-1, 1]),
+    ('2d6!', {6: [6, 1, 3, 2, 6, 1]}, [14, 5]),
+])
+def test_evaluate(expression: str, dice: dict, output: List[int]):
+    def roll_dice(sides: int, n: int) -> List[int]:
+        rolls, dice[sides] = dice[sides][:n], dice[sides][n:]
+        return rolls
+
+    n = len(output)
+    assert_that(compile_dice(expression).evaluate(roll_dice, n)).is_equal_to(output)
+
+
+@responses.activate
+def test_roll_packs_dice_in_integers():
+    # 11 d6 fit in each random.org integer: 5 + 1 * 6 + 2 * 36 => 6, 2, 3, 1, 1, ...
+    responses.add(responses.GET, INTEGER_URL, body=str(5 + 1 * 6 + 2 * 36))
+    vera = RandomOrg(MAX_QUOTA)
+    with mock.patch.object(vera, 'randint', wraps=vera.randint) as randint:
+        assert_that(vera.roll('3d6+1')).is_equal_to(6 + 2 + 3 + 1)
+    randint.assert_called_once_with(0, 6 ** 11 - 1, 1)
+
+
+def test_roll_makes_constant_number_of_requests():
+    vera = RandomOrg(MAX_QUOTA)
+    with mock.patch.object(vera, 'randint', side_effect=lambda a, b, n: [b] * n) as randint:
+        rolls = vera.roll('8d6+3', n=100_000)
+    assert_that(rolls).is_length(100_000)
+    assert_that(set(rolls)).is_equal_to({51})
+    assert_that(randint.call_count).is_equal_to(
+        -(-8 * 100_000 // 11 // MAX_NUMBER_OF_INTEGERS))
+
+
+def test_too_few_rolls():
+    with raises(NoRandomNumbersRequested):
+        RandomOrg(MAX_QUOTA).roll('1d6', n=0)
+
+
+@mark.parametrize('vera, sides', [(RandomOrg(MAX_QUOTA), MAX_INTEGER_LIMIT + 2),
+                                  (DaemonRandom(), 2 ** 64)])
+def test_too_many_sides(vera, sides: int):
+    with mock.patch.object(vera, '_make_random_request') as make_random_request:
+        with raises(RandomNumberLimitTooLarge):
+            vera.roll(f'd{sides}')
+    make_random_request.assert_not_called()
+
+
+def test_max_sides():
+    vera = RandomOrg(MAX_QUOTA)
+    with mock.patch.object(vera, 'randint', side_effect=lambda a, b, n: [b] * n) as randint:
+        assert_that(vera.roll(f'd{MAX_INTEGER_LIMIT + 1}')).is_equal_to(MAX_INTEGER_LIMIT + 1)
+    randint.assert_called_once_with(0, MAX_INTEGER_LIMIT, 1)
+
+
+def test_max_dice():
+    assert_that(compile_dice(f'{MAX_DICE // 2}d6+{MAX_DICE // 2}d4').terms).is_length(2)
+
+
+def test_endless_explosions():
+    roll_dice = mock.MagicMock(side_effect=lambda sides, n: [sides] * n)
+    with raises(TooManyDiceExplosions):
+        compile_dice('2d6!').evaluate(roll_dice, 3)
+    assert_that(roll_dice.call_count).is_equal_to(MAX_EXPLOSION_ROUNDS + 1)
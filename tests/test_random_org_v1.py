@@ -1,17 +1,22 @@
+from math import log, sqrt
+from threading import Thread
 from typing import Callable, Any, List, Tuple, Type
 from unittest import mock
 
 import responses
+from requests import ConnectTimeout, ConnectionError
 from assertpy import assert_that
 from pytest import mark, raises
 
 from verarandom import (
     RandomOrg, BitQuotaExceeded, TooManyRandomNumbersRequested, RandomNumberLimitTooLarge,
-    NoRandomNumbersRequested, RandomNumberLimitTooSmall, HTTPError
+    NoRandomNumbersRequested, RandomNumberLimitTooSmall, HTTPError, DeadlineExceeded, Fallback,
+    RandomSource, ServiceUnavailable,
 )
+from verarandom import random_org_v1
 from verarandom.random_org_v1 import (
     QUOTA_URL, MAX_QUOTA, INTEGER_URL, MAX_NUMBER_OF_INTEGERS, MAX_INTEGER_LIMIT,
-    MIN_INTEGER_LIMIT,
+    MIN_INTEGER_LIMIT, MAX_NUMBER_OF_FLOATS,
 )
 
 
@@ -125,6 +130,11 @@ def test_max_integer_too_small():
                               MIN_INTEGER_LIMIT - 1, 1)
 
 
+def test_max_integer_too_large_with_zero_lower_limit():
+    _assert_randint_exception(RandomOrg(MAX_QUOTA), RandomNumberLimitTooLarge, 0,
+                              MAX_INTEGER_LIMIT + 1, 1)
+
+
 def test_min_integer_upper_limit():
     _check_randint_parameters(RandomOrg(MAX_QUOTA), MAX_INTEGER_LIMIT, 1, 1)
 
@@ -143,6 +153,113 @@ def test_min_integer_too_small():
                               MIN_INTEGER_LIMIT - 1, 1, 1)
 
 
+@responses.activate
+def test_request_timeout_is_remaining_deadline():
+    _patch_int_response('4')
+    vera = RandomOrg(MAX_QUOTA, deadline=5)
+    with mock.patch('verarandom.random_org_v1.get', wraps=random_org_v1.get) as get:
+        vera.randint(1, 6)
+    assert_that(get.call_args[1]['timeout']).is_greater_than(0).is_less_than_or_equal_to(5)
+    assert_that(vera.last_source).is_equal_to(RandomSource.SERVICE)
+
+
+@responses.activate
+def test_no_timeout_without_deadline():
+    _patch_int_response('4')
+    with mock.patch('verarandom.random_org_v1.get', wraps=random_org_v1.get) as get:
+        RandomOrg(MAX_QUOTA).randint(1, 6)
+    assert_that(get.call_args[1]['timeout']).is_none()
+
+
+@responses.activate
+def test_deadline_exceeded():
+    _patch_int_response(ConnectTimeout())
+    with raises(DeadlineExceeded):
+        RandomOrg(MAX_QUOTA).randint(1, 6, deadline=0.05)
+
+
+def test_expired_deadline_makes_no_request():
+    with raises(DeadlineExceeded):
+        RandomOrg(MAX_QUOTA).randint(1, 6, deadline=0)
+
+
+@responses.activate
+def test_system_random_fallback():
+    _patch_int_response(ConnectTimeout())
+    vera = RandomOrg(MAX_QUOTA, fallback=Fallback.SYSTEM_RANDOM)
+    randints = vera.randint(1, 6, n=10, deadline=0.05)
+    assert_that(randints).is_length(10)
+    assert_that(min(randints)).is_greater_than_or_equal_to(1)
+    assert_that(max(randints)).is_less_than_or_equal_to(6)
+    assert_that(vera.last_source).is_equal_to(RandomSource.SYSTEM_RANDOM)
+    assert_that(vera.quota_estimate).is_equal_to(MAX_QUOTA)
+
+
+def test_system_random_fallback_for_floats():
+    vera = RandomOrg(MAX_QUOTA, deadline=0, fallback=Fallback.SYSTEM_RANDOM)
+    assert_that(vera.random()).is_between(0, 1)
+    assert_that(vera.last_source).is_equal_to(RandomSource.SYSTEM_RANDOM)
+
+
+@responses.activate
+def test_unreachable_service():
+    _patch_int_response(ConnectionError())
+    with raises(ServiceUnavailable):
+        RandomOrg(MAX_QUOTA).randint(1, 6)
+
+
+@responses.activate
+def test_unreachable_service_fallback():
+    _patch_int_response(ConnectionError())
+    vera = RandomOrg(MAX_QUOTA, deadline=1, fallback=Fallback.SYSTEM_RANDOM)
+    assert_that(vera.randint(1, 6)).is_between(1, 6)
+    assert_that(vera.last_source).is_equal_to(RandomSource.SYSTEM_RANDOM)
+
+
+@responses.activate
+def test_deadlines_are_per_thread():
+    _patch_int_response('4')
+    vera = RandomOrg(MAX_QUOTA)
+    real_get = random_org_v1.get
+    timeouts = []
+
+    def get(*args, **kwargs):
+        timeouts.append(kwargs['timeout'])
+        if len(timeouts) == 1:
+            thread = Thread(target=vera.randint, args=(1, 6))
+            thread.start()
+            thread.join()
+        return real_get(*args, **kwargs)
+
+    with mock.patch('verarandom.random_org_v1.get', side_effect=get):
+        vera.randint(1, 6, deadline=10)
+    assert_that(timeouts[0]).is_greater_than(0)
+    assert_that(timeouts[1]).is_none()
+
+
+def test_deadline_covers_every_batch():
+    vera = RandomOrg(MAX_QUOTA, deadline=0.05, fallback=Fallback.SYSTEM_RANDOM)
+    with mock.patch.object(vera, '_request_randints',
+                           side_effect=ConnectTimeout()) as request_randints:
+        assert_that(vera.gauss(n=3 * MAX_NUMBER_OF_FLOATS)).is_length(3 * MAX_NUMBER_OF_FLOATS)
+    request_randints.assert_called_once()
+    assert_that(vera.last_source).is_equal_to(RandomSource.SYSTEM_RANDOM)
+
+
+def test_mixed_sources():
+    vera = RandomOrg(MAX_QUOTA, fallback=Fallback.SYSTEM_RANDOM)
+    with mock.patch.object(vera, '_request_randints',
+                           side_effect=[[0] * 3 * MAX_NUMBER_OF_FLOATS, ConnectTimeout()]):
+        vera.random(MAX_NUMBER_OF_FLOATS + 1)
+    assert_that(vera.last_source).is_equal_to(RandomSource.MIXED)
+
+
+def test_roll_deadline():
+    vera = RandomOrg(MAX_QUOTA, fallback=Fallback.SYSTEM_RANDOM)
+    assert_that(vera.roll('2d6', deadline=0)).is_between(2, 12)
+    assert_that(vera.last_source).is_equal_to(RandomSource.SYSTEM_RANDOM)
+
+
 @mark.parametrize('lower, upper, n, mock_response, bits', [(1, 8, 3, '7\n1\n4', 7)])
 @responses.activate
 def test_quota_diminishes_after_request(lower: int, upper: int,
@@ -185,3 +302,59 @@ def _check_randint_parameters(vera: RandomOrg, *args):
 def _assert_randint_exception(vera: RandomOrg, ex: Type[Exception], *args):
     with raises(ex):
         _check_randint_parameters(vera, *args)
+
+
+@responses.activate
+def test_randoms_use_single_request():
+    _patch_int_response('12345\n67890\n11111\n50000\n0\n0')
+    assert_that(RandomOrg(MAX_QUOTA).random(2)).is_equal_to([0.12345_67890_11111, 0.5])
+    assert_that(responses.calls).is_length(1)
+
+
+@mark.parametrize('vera_method, args, n, output', [
+    ('uniform', (10, 20), None, 15.0),
+    ('uniform', (10, 20), 2, [15.0, 12.5]),
+    ('triangular', (0, 1), 2, [0.5, sqrt(0.125)]),
+    ('expovariate', (2,), 1, [log(2) / 2]),
+    ('gauss', (0, 1), 1, [0]),
+    ('normalvariate', (1, 2), 2, [1, 1 + 2 * sqrt(2 * log(2))]),
+])
+def test_distributions(vera_method: str, args: Tuple, n: int, output: Any):
+    vera = RandomOrg(MAX_QUOTA)
+    with mock.patch.object(vera, 'random', return_value=[0.5, 0.25, 0.5, 0.25]) as random:
+        randoms = getattr(vera, vera_method)(*args, n=n)
+        _assert_all_close(randoms if n else [randoms], output if n else [output])
+        random.assert_called_once()
+
+
+def test_randoms_are_split_into_max_requests():
+    vera = RandomOrg(MAX_QUOTA)
+    with mock.patch.object(vera, 'randint', side_effect=lambda a, b, n: [0] * n) as randint:
+        assert_that(vera.random(MAX_NUMBER_OF_FLOATS + 1)).is_length(MAX_NUMBER_OF_FLOATS + 1)
+    assert_that([call[0][2] for call in randint.call_args_list]).is_equal_to(
+        [3 * MAX_NUMBER_OF_FLOATS, 3])
+
+
+def test_too_few_randoms():
+    with raises(NoRandomNumbersRequested):
+        RandomOrg(MAX_QUOTA).random(0)
+
+
+def test_distributions_are_split_into_max_requests():
+    vera = RandomOrg(MAX_QUOTA)
+    with mock.patch.object(vera, 'random', side_effect=lambda n: [0.5] * n) as random:
+        assert_that(vera.uniform(0, 1, n=MAX_NUMBER_OF_FLOATS + 1)).is_length(
+            MAX_NUMBER_OF_FLOATS + 1)
+        assert_that(random.call_args_list).is_equal_to(
+            [mock.call(MAX_NUMBER_OF_FLOATS), mock.call(1)])
+
+
+def test_too_few_distribution_numbers():
+    with raises(NoRandomNumbersRequested):
+        RandomOrg(MAX_QUOTA).gauss(0, 1, n=0)
+
+
+def _assert_all_close(randoms: List[float], expected: List[float]):
+    assert_that(randoms).is_length(len(expected))
+    for random, expected_random in zip(randoms, expected):
+        assert_that(random).is_close_to(expected_random, 1e-9)
@@ -1,15 +1,18 @@
 from verarandom.errors import *
 from verarandom._random_generator import *
 from verarandom.random_org_v1 import *
+from verarandom.dice import DiceExpression, compile_dice
 from verarandom._build_utils import _set_module_names_for_sphinx
 
 
 __version__ = '2.0.1'
 
 
-objects_with_modified_module_names = [RandomConfig, VeraRandom, VeraRandomQuota]
+objects_with_modified_module_names = [
+    RandomConfig, VeraRandom, VeraRandomQuota, Fallback, RandomSource,
+]
 _set_module_names_for_sphinx(objects_with_modified_module_names, __name__)
 
 __ALL__ = [
-    *objects_with_modified_module_names, errors, random_org_v1, HTTPError,
+    *objects_with_modified_module_names, errors, random_org_v1, dice, HTTPError,
 ]
@@ -0,0 +1,24 @@
+""" Command line interface: ``verarandom serve`` runs the local entropy daemon. """
+from argparse import ArgumentParser
+from typing import List, Optional
+
+from verarandom.daemon import get_default_socket_path, serve
+
+
+def main(args: Optional[List[str]] = None):
+    parser = ArgumentParser(prog='verarandom', description='True random numbers in Python')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='serve random.org entropy locally')
+    default_socket_path = get_default_socket_path()
+    serve_parser.add_argument('--socket', default=default_socket_path,
+                              help=f'Unix socket to listen on (default: {default_socket_path})')
+    serve_parser.add_argument('--fetch-size', type=int,
+                              help='integers requested to random.org each time the buffer is empty')
+
+    parsed_args = parser.parse_args(args)
+    serve(parsed_args.socket, fetch_size=parsed_args.fetch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,27 @@
 from abc import ABCMeta, abstractmethod
-from dataclasses import dataclass
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import Enum
 from functools import wraps
-from random import Random
-from typing import Optional, Union, List, Any, Callable
+from math import ceil, cos, log, pi, sin, sqrt
+from random import Random, SystemRandom
+from threading import local
+from time import monotonic
+from typing import Optional, Union, List, Any, Callable, Set
 
 import requests
 
+from verarandom.dice import compile_dice
 from verarandom.errors import (
     BitQuotaExceeded, NoRandomNumbersRequested, TooManyRandomNumbersRequested,
-    RandomNumberLimitTooLarge, RandomNumberLimitTooSmall, HTTPError,
+    RandomNumberLimitTooLarge, RandomNumberLimitTooSmall, HTTPError, DeadlineExceeded,
+    ServiceUnavailable,
 )
 
 
+_system_random = SystemRandom()
+
+
 @dataclass(frozen=True)
 class RandomConfig:
     # noinspection PyUnresolvedReferences
@@ -28,11 +38,51 @@ class RandomConfig:
     MAX_NUMBER_OF_FLOATS: int
 
 
+class Fallback(Enum):
+    """ What to do when the service is unreachable or can't answer before the deadline
+
+    :cvar SYSTEM_RANDOM: generate numbers locally with :py:class:`random.SystemRandom`
+    :cvar RAISE: raise :py:class:`verarandom.errors.ServiceUnavailable` or its subclass
+        :py:class:`verarandom.errors.DeadlineExceeded`
+    """
+    SYSTEM_RANDOM = 'system_random'
+    RAISE = 'raise'
+
+
+class RandomSource(Enum):
+    """ Where the last generated numbers came from
+
+    :cvar SERVICE: the online service
+    :cvar SYSTEM_RANDOM: the local fallback, :py:class:`random.SystemRandom`
+    :cvar MIXED: some numbers came from the service and the rest from the fallback
+    """
+    SERVICE = 'service'
+    SYSTEM_RANDOM = 'system_random'
+    MIXED = 'mixed'
+
+
+@dataclass
+class _Call:
+    """ State shared by every request made for a single public call """
+    deadline_end: Optional[float]
+    sources: Set[RandomSource] = field(default_factory=set)
+
+    @property
+    def source(self) -> Optional[RandomSource]:
+        if len(self.sources) > 1:
+            return RandomSource.MIXED
+        return next(iter(self.sources), None)
+
+
 def reraise_request_errors(f: Callable):
     @wraps(f)
     def wrapper(*args, **kwargs):
         try:
             return f(*args, **kwargs)
+        except requests.Timeout as e:
+            raise DeadlineExceeded(str(e)) from e
+        except requests.ConnectionError as e:
+            raise ServiceUnavailable(str(e)) from e
         except requests.HTTPError as e:
             raise HTTPError(str(e)) from e
 
@@ -44,14 +94,39 @@ class VeraRandom(Random, metaclass=ABCMeta):
 
     Subclasses calculate true random numbers using a suitable online service. This class provides
     parameter validation using a configuration with minimum and maximum allowed values.
+
+    A deadline (in seconds) may be given per instance or per call and covers every request made by
+    the call. If the service is unreachable or can't answer in time, the fallback is used for the
+    rest of the call and :py:attr:`last_source` records where its numbers came from. Subclasses use
+    the remaining time as the timeout of each request; for :py:mod:`requests` it bounds every
+    connection attempt and every read, not the whole download, so a response that keeps trickling
+    in may exceed the deadline.
+
+    Deadlines and sources are tracked per thread, so an instance may be shared between threads.
     """
-    def __init__(self, config: RandomConfig):
+    def __init__(self, config: RandomConfig, deadline: Optional[float] = None,
+                 fallback: Fallback = Fallback.RAISE):
         """
         :param config: values to use in parameter validation
+        :param deadline: default number of seconds each call may take, unlimited if None
+        :param fallback: what to do if the service is unavailable or the deadline is exceeded
         """
         self.config = config
+        self.deadline = deadline
+        self.fallback = fallback
+        self._local = local()
         super().__init__()
 
+    @property
+    def last_source(self) -> Optional[RandomSource]:
+        """ Where the numbers of the current thread's last call came from.
+
+        Results keep :py:mod:`random`'s types, so this is how they are audited. Calls made by
+        another call (like :py:func:`gauss` calling :py:func:`random`) don't replace it, but any
+        later call from the same thread does.
+        """
+        return getattr(self._local, 'last_source', None)
+
     def seed(self, *args, **kwargs):
         """ Empty definition. """
 
@@ -61,19 +136,71 @@ class VeraRandom(Random, metaclass=ABCMeta):
     def setstate(self, _):
         """ Empty definition. """
 
-    def random(self, n: Optional[int] = None) -> Union[List[float], float]:
+    def random(self, n: Optional[int] = None,
+               deadline: Optional[float] = None) -> Union[List[float], float]:
         """ Similar to :py:func:`randint` """
-        return self._generate_randoms(self._request_randoms, max_n=self.config.MAX_NUMBER_OF_FLOATS,
-                                      n=n)
+        return self._generate_randoms(self._request_randoms, _request_system_randoms,
+                                      max_n=self.config.MAX_NUMBER_OF_FLOATS, n=n,
+                                      deadline=deadline)
 
-    def randint(self, a: int, b: int, n: Optional[int] = None) -> Union[List[int], int]:
+    def randint(self, a: int, b: int, n: Optional[int] = None,
+                deadline: Optional[float] = None) -> Union[List[int], int]:
         """ Generate n numbers as a list or a single one if no n is given.
 
         n is used to minimize the number of requests made and return type changes to be compatible
-        with :py:mod:`random`'s interface
+        with :py:mod:`random`'s interface. deadline overrides the instance's deadline for this call.
         """
         max_n = self.config.MAX_NUMBER_OF_INTEGERS
-        return self._generate_randoms(self._request_randints, max_n=max_n, a=a, b=b, n=n)
+        return self._generate_randoms(self._request_randints, _request_system_randints,
+                                      max_n=max_n, a=a, b=b, n=n, deadline=deadline)
+
+    def gauss(self, mu: float = 0.0, sigma: float = 1.0, n: Optional[int] = None,
+              deadline: Optional[float] = None) -> Union[List[float], float]:
+        """ Normal distribution computed with the Box-Muller transform.
+
+        Two uniform floats are used for every pair of numbers, so all of them are fetched in bulk.
+        """
+        return self._transform_randoms(_box_muller, 2 * ceil(_n_or_default(n) / 2), n, deadline,
+                                       mu=mu, sigma=sigma)
+
+    def normalvariate(self, mu: float = 0.0, sigma: float = 1.0, n: Optional[int] = None,
+                      deadline: Optional[float] = None) -> Union[List[float], float]:
+        """ Similar to :py:func:`gauss` """
+        return self.gauss(mu, sigma, n, deadline)
+
+    def expovariate(self, lambd: float = 1.0, n: Optional[int] = None,
+                    deadline: Optional[float] = None) -> Union[List[float], float]:
+        """ Similar to :py:func:`random.expovariate` but accepts n like :py:func:`randint` """
+        return self._transform_randoms(_exponential, _n_or_default(n), n, deadline, lambd=lambd)
+
+    def uniform(self, a: float, b: float, n: Optional[int] = None,
+                deadline: Optional[float] = None) -> Union[List[float], float]:
+        """ Similar to :py:func:`random.uniform` but accepts n like :py:func:`randint` """
+        return self._transform_randoms(_uniform, _n_or_default(n), n, deadline, a=a, b=b)
+
+    def triangular(self, low: float = 0.0, high: float = 1.0, mode: Optional[float] = None,
+                   n: Optional[int] = None,
+                   deadline: Optional[float] = None) -> Union[List[float], float]:
+        """ Similar to :py:func:`random.triangular` but accepts n like :py:func:`randint` """
+        return self._transform_randoms(_triangular, _n_or_default(n), n, deadline, low=low,
+                                       high=high, mode=mode)
+
+    def roll(self, expression: str, n: Optional[int] = None,
+             deadline: Optional[float] = None) -> Union[List[int], int]:
+        """ Roll a dice expression like '8d6+3', '4d6kh3' or '2d10!-1'
+
+        See :py:mod:`verarandom.dice` for the supported notation.
+
+        All the rolls are computed together, so the number of requests depends on the number of
+        dice and on the service's limits instead of on n.
+        """
+        n_or_default = _n_or_default(n)
+        if n_or_default < 1:
+            raise NoRandomNumbersRequested
+        dice_expression = compile_dice(expression)
+        with self._call_context(deadline):
+            totals = dice_expression.evaluate(self._roll_dice, n_or_default)
+        return totals if n else totals[0]
 
     @abstractmethod
     def _request_randoms(self, n: int) -> List[float]:
@@ -86,15 +213,102 @@ class VeraRandom(Random, metaclass=ABCMeta):
     def _request_randints(self, a: int, b: int, n: int) -> List[int]:
         """ Similar to :py:func:`_request_randoms` """
 
-    def _generate_randoms(self, requester: Callable, *, max_n: int, n: int, **req_kwargs):
+    def _generate_randoms(self, requester: Callable, fallback_requester: Callable, *, max_n: int,
+                          n: int, deadline: Optional[float], **req_kwargs):
         n_or_default = 1 if n is None else n
         self._check_random_parameters(max_n, n_or_default, **req_kwargs)
-        randoms = self._make_random_request(requester, **req_kwargs, n=n_or_default)
+        with self._call_context(deadline) as call:
+            randoms = self._make_random_request_or_fall_back(
+                call, requester, fallback_requester, **req_kwargs, n=n_or_default)
         return randoms if n else randoms[0]
 
+    def _make_random_request_or_fall_back(self, call: _Call, requester: Callable,
+                                          fallback_requester: Callable, **req_kwargs) -> List:
+        if RandomSource.SYSTEM_RANDOM not in call.sources:
+            try:
+                randoms = self._make_random_request(requester, **req_kwargs)
+                call.sources.add(RandomSource.SERVICE)
+                return randoms
+            except ServiceUnavailable:
+                if self.fallback is Fallback.RAISE:
+                    raise
+        call.sources.add(RandomSource.SYSTEM_RANDOM)
+        return fallback_requester(**req_kwargs)
+
+    @contextmanager
+    def _call_context(self, deadline: Optional[float]):
+        """ Share a public call's deadline and sources with every request it makes.
+
+        Calls made while another one is running in the same thread join it, ignoring their own
+        deadline.
+        """
+        call = getattr(self._local, 'call', None)
+        if call is not None:
+            yield call
+            return
+
+        deadline_or_default = self.deadline if deadline is None else deadline
+        call = _Call(None if deadline_or_default is None else monotonic() + deadline_or_default)
+        self._local.call = call
+        try:
+            yield call
+            self._local.last_source = call.source
+        finally:
+            self._local.call = None
+
+    def _get_remaining_time(self) -> Optional[float]:
+        """ Seconds left before the current call's deadline or None if it has no deadline.
+
+        Meant to be used by subclasses as their requests' timeout.
+        """
+        call = getattr(self._local, 'call', None)
+        if call is None or call.deadline_end is None:
+            return None
+        remaining_time = call.deadline_end - monotonic()
+        if remaining_time <= 0:
+            raise DeadlineExceeded
+        return remaining_time
+
+    def _transform_randoms(self, transform: Callable[..., List[float]], number_of_uniforms: int,
+                           n: Optional[int], deadline: Optional[float], **transform_kwargs):
+        n_or_default = _n_or_default(n)
+        if n_or_default < 1:
+            raise NoRandomNumbersRequested
+        with self._call_context(deadline):
+            uniforms = self._request_uniforms(number_of_uniforms)
+        randoms = transform(uniforms, **transform_kwargs)[:n_or_default]
+        return randoms if n else randoms[0]
+
+    def _request_uniforms(self, n: int) -> List[float]:
+        """ Request n floats, splitting them into as few requests as the service allows. """
+        uniforms = []
+        while len(uniforms) < n:
+            batch_size = min(n - len(uniforms), self.config.MAX_NUMBER_OF_FLOATS)
+            uniforms.extend(self.random(batch_size))
+        return uniforms
+
+    def _roll_dice(self, sides: int, n: int) -> List[int]:
+        """ Roll n dice, packing as many as fit in each requested integer as base sides digits """
+        if sides == 1:
+            return [1] * n
+        dice_per_integer = 1
+        while sides ** (dice_per_integer + 1) - 1 <= self.config.MAX_INTEGER:
+            dice_per_integer += 1
+
+        dice = []
+        number_of_integers = ceil(n / dice_per_integer)
+        max_n = self.config.MAX_NUMBER_OF_INTEGERS
+        for batch_start in range(0, number_of_integers, max_n):
+            batch_size = min(max_n, number_of_integers - batch_start)
+            for integer in self.randint(0, sides ** dice_per_integer - 1, batch_size):
+                for _ in range(dice_per_integer):
+                    integer, die = divmod(integer, sides)
+                    dice.append(die + 1)
+        return dice[:n]
+
     def _check_random_parameters(self, max_n: int, n: int, a: Optional[int] = None,
                                  b: Optional[int] = None):
-        if a and b:
+        if a is not None and b is not None:
             self._check_random_range(a, b)
         self._check_number_of_randoms(n, max_n)
 
@@ -116,6 +330,46 @@ class VeraRandom(Random, metaclass=ABCMeta):
         return requester(**kwargs)
 
 
+def _request_system_randoms(n: int) -> List[float]:
+    return [_system_random.random() for _ in range(n)]
+
+
+def _request_system_randints(a: int, b: int, n: int) -> List[int]:
+    return [_system_random.randint(a, b) for _ in range(n)]
+
+
+def _n_or_default(n: Optional[int]) -> int:
+    return 1 if n is None else n
+
+
+def _box_muller(uniforms: List[float], mu: float, sigma: float) -> List[float]:
+    radii = (sqrt(-2.0 * log(1.0 - u)) * sigma for u in uniforms[::2])
+    randoms = []
+    for radius, u in zip(radii, uniforms[1::2]):
+        angle = 2.0 * pi * u
+        randoms.extend((mu + radius * cos(angle), mu + radius * sin(angle)))
+    return randoms
+
+
+def _exponential(uniforms: List[float], lambd: float) -> List[float]:
+    return [-log(1.0 - u) / lambd for u in uniforms]
+
+
+def _uniform(uniforms: List[float], a: float, b: float) -> List[float]:
+    return [a + (b - a) * u for u in uniforms]
+
+
+def _triangular(uniforms: List[float], low: float, high: float,
+                mode: Optional[float]) -> List[float]:
+    try:
+        c = 0.5 if mode is None else (mode - low) / (high - low)
+    except ZeroDivisionError:
+        return [low] * len(uniforms)
+    return [low + (high - low) * sqrt(u * c) if u <= c
+            else high + (low - high) * sqrt((1.0 - u) * (1.0 - c))
+            for u in uniforms]
+
+
 class VeraRandomQuota(VeraRandom, metaclass=ABCMeta):
     """ :py:class:`abc.ABC` for services with a limited number of bits per user like random.org
 
@@ -125,15 +379,18 @@ class VeraRandomQuota(VeraRandom, metaclass=ABCMeta):
     NOTE: this class assumes it's the only one talking to the server when calculating its quota.
     """
     def __init__(self, config: RandomConfig, initial_quota: Optional[int] = None,
-                 quota_limit: int = 0):
+                 quota_limit: int = 0, deadline: Optional[float] = None,
+                 fallback: Fallback = Fallback.RAISE):
         """
         :param config: values to use in parameter validation
         :param initial_quota: last known quota
         :param quota_limit: minimum number of bits in quota to allow a request
+        :param deadline: default number of seconds each call may take, unlimited if None
+        :param fallback: what to do if the service is unavailable or the deadline is exceeded
         """
         self._remaining_quota = initial_quota
         self.quota_limit = quota_limit
-        super().__init__(config)
+        super().__init__(config, deadline, fallback)
 
     @property
     def quota_estimate(self) -> int:
@@ -0,0 +1,359 @@
+""" Local daemon sharing a single upstream service between processes through a Unix socket.
+
+The daemon buffers the upstream service's entropy and serves it with a compact binary protocol.
+Requests may be pipelined and are answered in order:
+
+* request: a 1 byte operation followed by its fields (see :py:class:`_Operation`)
+* response: a 1 byte status and a 4 byte payload length followed by the payload
+
+All numbers are big-endian.
+
+This module needs Unix domain sockets, so it isn't imported by :py:mod:`verarandom`.
+"""
+import socket
+from enum import IntEnum
+from os import environ, getuid, path, stat, umask, unlink, urandom
+from socketserver import StreamRequestHandler, ThreadingUnixStreamServer
+from stat import S_ISSOCK
+from struct import Struct, pack, unpack
+from tempfile import gettempdir
+from threading import Condition, Lock, Thread
+from typing import List, Optional, BinaryIO
+
+from verarandom import errors, VeraRandom, RandomConfig, Fallback
+from verarandom.errors import (
+    VeraRandomError, DaemonError, DeadlineExceeded, NoRandomNumbersRequested,
+    TooManyRandomNumbersRequested, RandomNumberLimitTooSmall, ServiceUnavailable,
+)
+
+
+def get_default_socket_path() -> str:
+    """ $XDG_RUNTIME_DIR/verarandom.sock or a per-user socket in the temporary directory """
+    runtime_dir = environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return path.join(runtime_dir, 'verarandom.sock')
+    return path.join(gettempdir(), f'verarandom-{getuid()}.sock')
+
+
+SOCKET_UMASK = 0o177
+
+MAX_INTEGER_LIMIT = 2 ** 63 - 1
+MIN_INTEGER_LIMIT = -2 ** 63
+MAX_NUMBER_OF_ITEMS = 2 ** 20
+
+WORD_MAX = 2 ** 16 - 1
+FLOAT_BYTES = 7
+FLOAT_SHIFT = FLOAT_BYTES * 8 - 53
+
+_RANDINTS_FIELDS = Struct('!qqI')
+_COUNT_FIELD = Struct('!I')
+_RESPONSE_HEADER = Struct('!BI')
+_ERROR_SEPARATOR = b'\0'
+
+
+class _Operation(IntEnum):
+    RANDINTS = 1  # a: int64, b: int64, n: uint32 -> n int64
+    RANDOMS = 2  # n: uint32 -> n float64
+    BYTES = 3  # n: uint32 -> n bytes
+
+
+class _Status(IntEnum):
+    OK = 0
+    ERROR = 1  # payload: error class name, separator and message
+
+
+class EntropyPool:
+    """ Buffer of random bytes fetched in bulk from a :py:class:`verarandom.VeraRandom` service.
+
+    Integers are reduced to their range exactly with rejection sampling. The buffer is refilled by
+    a background thread once it drops below its low-water mark, so requests are served from memory
+    unless they need more bytes than are buffered. Thread-safe.
+    """
+    def __init__(self, source: VeraRandom, fetch_size: Optional[int] = None,
+                 low_water_mark: Optional[int] = None):
+        """
+        :param source: service whose 16 bit integers are used as entropy
+        :param fetch_size: integers per request, defaults to the service's limit
+        :param low_water_mark: buffered bytes below which a refill starts, defaults to the bytes
+            of a single request
+        """
+        self.source = source
+        self.fetch_size = fetch_size or source.config.MAX_NUMBER_OF_INTEGERS
+        self.low_water_mark = low_water_mark or self.fetch_size * 2
+        self._buffer = b''
+        self._offset = 0
+        self._refilling = False
+        self._refill_error: Optional[Exception] = None
+        self._condition = Condition()
+
+    def randbytes(self, n: int) -> bytes:
+        with self._condition:
+            return self._take_bytes(n)
+
+    def randints(self, a: int, b: int, n: int) -> List[int]:
+        span = b - a + 1
+        if span < 1:
+            raise RandomNumberLimitTooSmall(b)
+        if span == 1:
+            return [a] * n
+        n_bits = (span - 1).bit_length()
+        n_bytes = (n_bits + 7) // 8
+        mask = (1 << n_bits) - 1
+
+        randints = []
+        with self._condition:
+            while len(randints) < n:
+                chunk = self._take_bytes((n - len(randints)) * n_bytes)
+                candidates = (int.from_bytes(chunk[i:i + n_bytes], 'big') & mask
+                              for i in range(0, len(chunk), n_bytes))
+                randints.extend(a + candidate for candidate in candidates if candidate < span)
+        return randints
+
+    def randoms(self, n: int) -> List[float]:
+        with self._condition:
+            chunk = self._take_bytes(n * FLOAT_BYTES)
+        return [(int.from_bytes(chunk[i:i + FLOAT_BYTES], 'big') >> FLOAT_SHIFT) * 2 ** -53
+                for i in range(0, len(chunk), FLOAT_BYTES)]
+
+    def _take_bytes(self, n: int) -> bytes:
+        """ Must be called while holding the condition's lock """
+        while len(self._buffer) - self._offset < n:
+            self._start_refill()
+            self._condition.wait()
+            if self._refill_error is not None:
+                raise self._refill_error
+
+        start = self._offset
+        self._offset += n
+        if len(self._buffer) - self._offset < self.low_water_mark:
+            self._start_refill()
+        return self._buffer[start:self._offset]
+
+    def _start_refill(self):
+        if not self._refilling:
+            self._refilling = True
+            self._refill_error = None
+            Thread(target=self._refill, daemon=True).start()
+
+    def _refill(self):
+        try:
+            words = self.source.randint(0, WORD_MAX, self.fetch_size)
+        except Exception as e:
+            with self._condition:
+                self._refill_error = e
+                self._refilling = False
+                self._condition.notify_all()
+            return
+
+        new_bytes = pack(f'!{len(words)}H', *words)
+        with self._condition:
+            self._buffer = self._buffer[self._offset:] + new_bytes
+            self._offset = 0
+            self._refilling = False
+            self._condition.notify_all()
+
+
+class EntropyServer(ThreadingUnixStreamServer):
+    """ Daemon answering requests from an :py:class:`EntropyPool`. One thread per connection. """
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, pool: EntropyPool):
+        """
+        :param socket_path: Unix socket to listen on, only accessible by the current user. A stale
+            socket left by a daemon that isn't running anymore is replaced.
+        :param pool: entropy shared by every connection
+        :raises verarandom.errors.DaemonError: if socket_path exists and isn't a stale socket
+        """
+        self.pool = pool
+        _remove_stale_socket(socket_path)
+        super().__init__(socket_path, _RequestHandler)
+
+    def server_bind(self):
+        old_umask = umask(SOCKET_UMASK)
+        try:
+            super().server_bind()
+        finally:
+            umask(old_umask)
+
+    def respond(self, operation: int, rfile: BinaryIO) -> bytes:
+        try:
+            payload = self._respond_ok(operation, rfile)
+        except DaemonError:
+            raise
+        except Exception as e:
+            payload = _ERROR_SEPARATOR.join((type(e).__name__.encode(), str(e).encode()))
+            return _RESPONSE_HEADER.pack(_Status.ERROR, len(payload)) + payload
+        return _RESPONSE_HEADER.pack(_Status.OK, len(payload)) + payload
+
+    def _respond_ok(self, operation: int, rfile: BinaryIO) -> bytes:
+        if operation == _Operation.RANDINTS:
+            a, b, n = _RANDINTS_FIELDS.unpack(_read_exactly(rfile, _RANDINTS_FIELDS.size))
+            _check_number_of_items(n)
+            return pack(f'!{n}q', *self.pool.randints(a, b, n))
+        if operation == _Operation.RANDOMS:
+            n, = _COUNT_FIELD.unpack(_read_exactly(rfile, _COUNT_FIELD.size))
+            _check_number_of_items(n)
+            return pack(f'!{n}d', *self.pool.randoms(n))
+        if operation == _Operation.BYTES:
+            n, = _COUNT_FIELD.unpack(_read_exactly(rfile, _COUNT_FIELD.size))
+            _check_number_of_items(n)
+            return self.pool.randbytes(n)
+        raise DaemonError(f'Unknown operation {operation}')
+
+
+class _RequestHandler(StreamRequestHandler):
+    def handle(self):
+        while True:
+            operation = self.rfile.read(1)
+            if not operation:
+                return
+            try:
+                response = self.server.respond(operation[0], self.rfile)
+            except DaemonError:
+                return
+            try:
+                self.wfile.write(response)
+            except OSError:
+                return
+
+
+class DaemonRandom(VeraRandom):
+    """ Client for a local :py:class:`EntropyServer`.
+
+    The connection is opened on the first request and reopened after errors. Instances may be
+    shared between threads, which take turns using the connection.
+    """
+    def __init__(self, socket_path: Optional[str] = None, deadline: Optional[float] = None,
+                 fallback: Fallback = Fallback.RAISE):
+        """
+        :param socket_path: Unix socket the daemon listens on, see
+            :py:func:`get_default_socket_path` for the default
+        :param deadline: default number of seconds each call may take, unlimited if None
+        :param fallback: what to do if the daemon is unavailable or the deadline is exceeded
+        """
+        self.socket_path = socket_path or get_default_socket_path()
+        self._socket: Optional[socket.socket] = None
+        self._socket_lock = Lock()
+        # noinspection PyArgumentList
+        config = RandomConfig(MAX_INTEGER_LIMIT, MIN_INTEGER_LIMIT, MAX_NUMBER_OF_ITEMS,
+                              MAX_NUMBER_OF_ITEMS)
+        super().__init__(config, deadline, fallback)
+
+    def randbytes(self, n: int, deadline: Optional[float] = None) -> bytes:
+        """ Similar to :py:func:`randint`, falling back to :py:func:`os.urandom` """
+        return self._generate_randoms(self._request_randbytes, _request_system_randbytes,
+                                      max_n=self.config.MAX_NUMBER_OF_INTEGERS, n=n,
+                                      deadline=deadline)
+
+    def close(self):
+        """ Close the connection to the daemon """
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _request_randoms(self, n: int) -> List[float]:
+        return list(unpack(f'!{n}d', self._request(_Operation.RANDOMS, _COUNT_FIELD.pack(n))))
+
+    def _request_randints(self, a: int, b: int, n: int) -> List[int]:
+        payload = self._request(_Operation.RANDINTS, _RANDINTS_FIELDS.pack(a, b, n))
+        return list(unpack(f'!{n}q', payload))
+
+    def _request_randbytes(self, n: int) -> bytes:
+        return self._request(_Operation.BYTES, _COUNT_FIELD.pack(n))
+
+    def _request(self, operation: _Operation, fields: bytes) -> bytes:
+        with self._socket_lock:
+            timeout = self._get_remaining_time()
+            try:
+                connection = self._connect(timeout)
+                connection.settimeout(timeout)
+                connection.sendall(bytes((operation,)) + fields)
+                status, length = _RESPONSE_HEADER.unpack(self._receive(_RESPONSE_HEADER.size))
+                payload = self._receive(length)
+            except socket.timeout as e:
+                self.close()
+                raise DeadlineExceeded(str(e)) from e
+            except OSError as e:
+                self.close()
+                raise ServiceUnavailable(str(e)) from e
+
+        if status == _Status.ERROR:
+            raise _decode_error(payload)
+        return payload
+
+    def _connect(self, timeout: Optional[float]) -> socket.socket:
+        if self._socket is None:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                connection.settimeout(timeout)
+                connection.connect(self.socket_path)
+            except OSError:
+                connection.close()
+                raise
+            self._socket = connection
+        return self._socket
+
+    def _receive(self, size: int) -> bytes:
+        chunks = []
+        while size:
+            chunk = self._socket.recv(min(size, 2 ** 16))
+            if not chunk:
+                raise ConnectionResetError('Connection closed by the daemon')
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+
+def serve(socket_path: Optional[str] = None, source: Optional[VeraRandom] = None,
+          fetch_size: Optional[int] = None):
+    """ Serve entropy from source (:py:class:`verarandom.RandomOrg` by default) until killed """
+    socket_path = socket_path or get_default_socket_path()
+    if source is None:
+        from verarandom.random_org_v1 import RandomOrg
+        source = RandomOrg()
+
+    with EntropyServer(socket_path, EntropyPool(source, fetch_size)) as server:
+        server.serve_forever()
+
+
+def _remove_stale_socket(socket_path: str):
+    try:
+        mode = stat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not S_ISSOCK(mode):
+        raise DaemonError(f'{socket_path} exists and is not a socket')
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except ConnectionRefusedError:
+            unlink(socket_path)
+            return
+    raise DaemonError(f'A daemon is already listening on {socket_path}')
+
+
+def _request_system_randbytes(n: int) -> bytes:
+    return urandom(n)
+
+
+def _read_exactly(rfile: BinaryIO, size: int) -> bytes:
+    data = rfile.read(size)
+    if len(data) < size:
+        raise DaemonError('Incomplete request')
+    return data
+
+
+def _check_number_of_items(n: int):
+    if n < 1:
+        raise NoRandomNumbersRequested
+    if n > MAX_NUMBER_OF_ITEMS:
+        raise TooManyRandomNumbersRequested(n)
+
+
+def _decode_error(payload: bytes) -> VeraRandomError:
+    name, _, message = payload.partition(_ERROR_SEPARATOR)
+    error_class = getattr(errors, name.decode(), None)
+    if not (isinstance(error_class, type) and issubclass(error_class, VeraRandomError)):
+        return VeraRandomError(f'{name.decode()}: {message.decode()}')
+    return error_class(message.decode())
@@ -0,0 +1,175 @@
+""" Dice notation like ``8d6+3``, ``4d6kh3`` or ``2d10!-1``.
+
+Supported terms, which may be added or subtracted:
+
+* ``NdM``: N dice with M sides (N defaults to 1 and ``d%`` means ``d100``)
+* ``!`` after a die: exploding dice, each maximum roll is rolled again and added to that die
+* ``khK``/``k`` K, ``klK``, ``dhK``, ``dlK``: keep highest, keep lowest, drop highest or drop
+  lowest K dice
+* plain integers as modifiers
+
+Expressions may have up to :py:data:`MAX_DICE` dice and exploding dice may be rolled again up to
+:py:data:`MAX_EXPLOSION_ROUNDS` times.
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from verarandom.errors import InvalidDiceExpression, TooManyDiceExplosions
+
+
+_TERM_PATTERN = re.compile(r'''
+    \s*(?P<sign>[+-])?\s*
+    (?:
+        (?P<count>\d*)d(?P<sides>\d+|%)(?P<exploding>!)?
+        (?:(?P<keep>kh|kl|dh|dl|k)(?P<keep_n>\d+))?
+        |(?P<modifier>\d+)
+    )\s*
+''', re.IGNORECASE | re.VERBOSE)
+
+PERCENTILE_SIDES = 100
+MAX_CACHED_EXPRESSIONS = 1024
+MAX_DICE = 1000
+MAX_EXPLOSION_ROUNDS = 100
+
+
+@dataclass(frozen=True)
+class DiceTerm:
+    # noinspection PyUnresolvedReferences
+    """ Group of identical dice in an expression
+
+    :param count: number of dice rolled
+    :param sides: number of sides of each die
+    :param exploding: whether maximum rolls are rolled again and added to their die
+    :param keep: number of dice added to the total, all of them if None
+    :param keep_highest: whether the highest or the lowest dice are kept
+    :param sign: 1 if the term is added, -1 if it's subtracted
+    """
+    count: int
+    sides: int
+    exploding: bool = False
+    keep: Optional[int] = None
+    keep_highest: bool = True
+    sign: int = 1
+
+    def evaluate(self, dice: List[int], start: int, n: int) -> List[int]:
+        """ Add each of the n groups of :py:attr:`count` dice in dice, beginning at start """
+        groups = (dice[i:i + self.count]
+                  for i in range(start, start + n * self.count, self.count))
+        if self.keep is None:
+            return [self.sign * sum(group) for group in groups]
+        return [self.sign * sum(sorted(group, reverse=self.keep_highest)[:self.keep])
+                for group in groups]
+
+
+@dataclass(frozen=True)
+class DiceExpression:
+    # noinspection PyUnresolvedReferences
+    """ Compiled dice expression, see :py:func:`compile_dice`
+
+    :param terms: dice groups in the expression
+    :param modifier: sum of the expression's integers
+    """
+    terms: Tuple[DiceTerm, ...]
+    modifier: int = 0
+
+    def evaluate(self, roll_dice: Callable[[int, int], List[int]], n: int) -> List[int]:
+        """ Evaluate the expression n times.
+
+        :param roll_dice: called with a number of sides and of dice, returns that many rolls. All
+            the dice with the same number of sides are requested together, and exploding dice make
+            one more request for each round of explosions.
+        :raises verarandom.errors.TooManyDiceExplosions: if dice keep exploding after
+            :py:data:`MAX_EXPLOSION_ROUNDS` rounds
+        """
+        dice_by_sides = self._roll_by_sides(roll_dice, n)
+        starts = dict.fromkeys(dice_by_sides, 0)
+        totals = [self.modifier] * n
+        for term in self.terms:
+            values = term.evaluate(dice_by_sides[term.sides], starts[term.sides], n)
+            starts[term.sides] += n * term.count
+            totals = [total + value for total, value in zip(totals, values)]
+        return totals
+
+    def _roll_by_sides(self, roll_dice: Callable[[int, int], List[int]],
+                       n: int) -> Dict[int, List[int]]:
+        counts = {}
+        for term in self.terms:
+            counts[term.sides] = counts.get(term.sides, 0) + n * term.count
+        dice_by_sides = {sides: roll_dice(sides, count) for sides, count in counts.items()}
+
+        exploding_sides = {term.sides for term in self.terms if term.exploding}
+        for sides in exploding_sides:
+            self._explode(roll_dice, sides, dice_by_sides[sides], n)
+        return dice_by_sides
+
+    def _explode(self, roll_dice: Callable[[int, int], List[int]], sides: int, dice: List[int],
+                 n: int):
+        exploding_slices = []
+        start = 0
+        for term in self.terms:
+            if term.sides == sides:
+                if term.exploding:
+                    exploding_slices.append(range(start, start + n * term.count))
+                start += n * term.count
+
+        pending = [i for slice_ in exploding_slices for i in slice_ if dice[i] == sides]
+        for _ in range(MAX_EXPLOSION_ROUNDS):
+            if not pending:
+                return
+            extra_dice = roll_dice(sides, len(pending))
+            for i, extra_die in zip(pending, extra_dice):
+                dice[i] += extra_die
+            pending = [i for i, extra_die in zip(pending, extra_dice) if extra_die == sides]
+        if pending:
+            raise TooManyDiceExplosions(MAX_EXPLOSION_ROUNDS)
+
+
+@lru_cache(maxsize=MAX_CACHED_EXPRESSIONS)
+def compile_dice(expression: str) -> DiceExpression:
+    """ Parse a dice expression, caching the result.
+
+    :raises verarandom.errors.InvalidDiceExpression: if the expression can't be parsed or has more
+        than :py:data:`MAX_DICE` dice
+    """
+    if not expression.strip():
+        raise InvalidDiceExpression(expression)
+
+    terms = []
+    modifier = 0
+    position = 0
+
+    while position < len(expression):
+        match = _TERM_PATTERN.match(expression, position)
+        if not match or match.end() == position or (position and not match['sign']):
+            raise InvalidDiceExpression(expression)
+        position = match.end()
+
+        sign = -1 if match['sign'] == '-' else 1
+        if match['modifier'] is not None:
+            modifier += sign * int(match['modifier'])
+        else:
+            terms.append(_create_term(expression, match, sign))
+
+    if sum(term.count for term in terms) > MAX_DICE:
+        raise InvalidDiceExpression(expression)
+    return DiceExpression(tuple(terms), modifier)
+
+
+def _create_term(expression: str, match, sign: int) -> DiceTerm:
+    count = int(match['count'] or 1)
+    sides = PERCENTILE_SIDES if match['sides'] == '%' else int(match['sides'])
+    exploding = bool(match['exploding'])
+    if count < 1 or sides < 1 or (exploding and sides == 1):
+        raise InvalidDiceExpression(expression)
+
+    keep, keep_highest = None, True
+    if match['keep']:
+        keep_option, keep_n = match['keep'].lower(), int(match['keep_n'])
+        if keep_n > count:
+            raise InvalidDiceExpression(expression)
+        keep_highest = keep_option in ('k', 'kh', 'dl')
+        keep = keep_n if keep_option.startswith('k') else count - keep_n
+
+    return DiceTerm(count, sides, exploding, keep, keep_highest, sign)
@@ -6,6 +6,18 @@ class HTTPError(VeraRandomError):
     """ An HTTP error occured """
 
 
+class ServiceUnavailable(VeraRandomError):
+    """ The service couldn't be reached """
+
+
+class DeadlineExceeded(ServiceUnavailable):
+    """ The service couldn't answer before the request's deadline """
+
+
+class DaemonError(VeraRandomError):
+    """ The local daemon couldn't start or received an invalid message """
+
+
 class BitQuotaExceeded(VeraRandomError):
     """ IP has exceeded bit quota and is not allowed to make further requests. """
 
@@ -28,3 +40,11 @@ class RandomNumberLimitTooLarge(RandomRequestFieldError):
 
 class RandomNumberLimitTooSmall(RandomRequestFieldError):
     """ Min random number requested is too small for the service's API """
+
+
+class InvalidDiceExpression(VeraRandomError, ValueError):
+    """ A dice expression couldn't be parsed or has too many dice """
+
+
+class TooManyDiceExplosions(VeraRandomError):
+    """ Exploding dice kept rolling their maximum for too many rounds """
@@ -4,7 +4,7 @@ from typing import List, Dict, Optional, Union
 
 from requests import get
 
-from verarandom import VeraRandomQuota, RandomConfig
+from verarandom import VeraRandomQuota, RandomConfig, Fallback, NoRandomNumbersRequested
 
 
 RANDOM_ORG_URL = 'https://www.random.org'
@@ -26,6 +26,9 @@ class _RandintsToFloatOptions(IntEnum):
     RANDINTS_NUMBER_OF_DIGITS = 5
 
 
+MAX_NUMBER_OF_FLOATS = MAX_NUMBER_OF_INTEGERS // _RandintsToFloatOptions.RANDINTS_QUANTITY.value
+
+
 class _RandintRequestFields(Enum):
     RANDOMIZATION = 'rnd'
     TRULY_RANDOM = 'new'
@@ -42,38 +45,52 @@ class RandomOrg(VeraRandomQuota):
 
      NOTE: this class assumes it's the only one talking to the server when calculating its quota.
      """
-    def __init__(self, initial_quota: Optional[int] = None):
+    def __init__(self, initial_quota: Optional[int] = None, deadline: Optional[float] = None,
+                 fallback: Fallback = Fallback.RAISE):
         # noinspection PyArgumentList
-        config = RandomConfig(MAX_INTEGER_LIMIT, MIN_INTEGER_LIMIT, MAX_NUMBER_OF_INTEGERS, 0)
-        super().__init__(config, initial_quota)
+        config = RandomConfig(MAX_INTEGER_LIMIT, MIN_INTEGER_LIMIT, MAX_NUMBER_OF_INTEGERS,
+                              MAX_NUMBER_OF_FLOATS)
+        super().__init__(config, initial_quota, deadline=deadline, fallback=fallback)
 
-    def random(self, n: Optional[int] = None) -> Union[List[float], float]:
+    def random(self, n: Optional[int] = None,
+               deadline: Optional[float] = None) -> Union[List[float], float]:
         """ Generate random float(s) by using integers as fractional part.
 
         random.org's API doesn't offer floats, but a sequence of integers can emulate this:
 
         [06357, 114, 0210] => 0.06357_00114_00210
+
+        The integers are fetched with as few requests as possible, each of them covering up to
+        MAX_NUMBER_OF_FLOATS floats.
         """
-        randoms = []
         n_or_default = 1 if n is None else n
+        if n_or_default < 1:
+            raise NoRandomNumbersRequested
 
-        for _ in range(n_or_default):
-            number_of_digits = _RandintsToFloatOptions.RANDINTS_NUMBER_OF_DIGITS.value
-            max_int = int('9' * number_of_digits)
-
-            randints = self.randint(0, max_int, _RandintsToFloatOptions.RANDINTS_QUANTITY.value)
-            zero_padded_ints = (str(randint).zfill(number_of_digits) for randint in randints)
-            random = float(f"0.{''.join(zero_padded_ints)}")
-            randoms.append(random)
+        randoms = []
+        with self._call_context(deadline):
+            for batch_start in range(0, n_or_default, MAX_NUMBER_OF_FLOATS):
+                batch_size = min(MAX_NUMBER_OF_FLOATS, n_or_default - batch_start)
+                randoms.extend(self._request_random_batch(batch_size))
 
         return randoms if n else randoms[0]
 
+    def _request_random_batch(self, n: int) -> List[float]:
+        number_of_digits = _RandintsToFloatOptions.RANDINTS_NUMBER_OF_DIGITS.value
+        randints_quantity = _RandintsToFloatOptions.RANDINTS_QUANTITY.value
+        max_int = int('9' * number_of_digits)
+
+        randints = self.randint(0, max_int, n * randints_quantity)
+        zero_padded_ints = [str(randint).zfill(number_of_digits) for randint in randints]
+        return [float(f"0.{''.join(zero_padded_ints[i:i + randints_quantity])}")
+                for i in range(0, len(zero_padded_ints), randints_quantity)]
+
     def _request_quota(self) -> int:
         return int(self._make_plain_text_request(QUOTA_URL))
 
     def _request_randints(self, a: int, b: int, n: int) -> List[int]:
         params = self._create_randint_request_params(a, b, n)
-        numbers_as_string = self._make_plain_text_request(INTEGER_URL, kwargs=params)
+        numbers_as_string = self._make_plain_text_request(INTEGER_URL, params)
         return [int(random) for random in numbers_as_string.splitlines()]
 
     @staticmethod
@@ -83,9 +100,9 @@ class RandomOrg(VeraRandomQuota):
                 _RandintRequestFields.MIN.value: a, _RandintRequestFields.MAX.value: b,
                 _RandintRequestFields.NUM.value: n, _RandintRequestFields.COL.value: 1}
 
-    @staticmethod
-    def _make_plain_text_request(url: str, **kwargs) -> str:
-        response = get(url, params={FORMAT: PLAIN_FORMAT, **kwargs})
+    def _make_plain_text_request(self, url: str, params: Optional[Dict] = None) -> str:
+        response = get(url, params={FORMAT: PLAIN_FORMAT, **(params or {})},
+                       timeout=self._get_remaining_time())
         response.raise_for_status()
 
         return response.text